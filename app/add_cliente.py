@@ -8,6 +8,15 @@ limite = 1000  # Exemplo de limite alto
 conn = sqlite3.connect("clients.db")
 cursor = conn.cursor()
 
+# PRAGMAs de desempenho (WAL permite leitores durante escritas)
+cursor.executescript(
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA busy_timeout=5000;"
+    "PRAGMA cache_size=-20000;"
+    "PRAGMA temp_store=MEMORY;"
+)
+
 cursor.execute("INSERT INTO clients (api_key, name, usage_limit) VALUES (?, ?, ?)", 
                (nova_chave, nome, limite))
 
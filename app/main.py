@@ -3,20 +3,36 @@ Módulo principal da API para a IA Vertical de Contabilidade.
 """
 
 import os
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Depends, status
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
+import time
+import asyncio
+import random
+import threading
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Depends, status, BackgroundTasks
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
+from anyio import to_thread
 import uvicorn
+import aiofiles
+import httpx
+import openai
 from typing import Dict, List, Optional, Any
+from functools import lru_cache
 import json
+import orjson
 from datetime import datetime, date, timedelta
+from uuid import uuid4
+import numpy as np
 import pandas as pd
+from sqlalchemy import bindparam, lambda_stmt, select
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from cachetools import TTLCache, LRUCache
 
 # Importar módulos da aplicação
 from app.models.document_classifier import DocumentClassifier, train_sample_model
@@ -25,6 +41,7 @@ from app.models.tax_analyzer import AnalisadorTributario, OportunidadeTributaria
 from app.services.report_service import ReportGenerator, FinancialData
 from app.services.bank_service import ConciliacaoBancaria
 from app.services.deadline_service import GestorObrigacoes, Obrigacao
+from app.semantic_cache import SemanticCache
 import db
 
 # Configurações de segurança
@@ -32,10 +49,18 @@ SECRET_KEY = os.getenv("SECRET_KEY", "chave_secreta_temporaria_deve_ser_alterada
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Configuração de criptografia de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Configuração de criptografia de senha: novos hashes usam argon2,
+# hashes bcrypt existentes continuam validando
+pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Cache de tokens já validados: evita repetir a verificação HMAC e o
+# SELECT do usuário em requisições consecutivas do mesmo cliente.
+# O TTL curto limita por quanto tempo um usuário desativado ainda
+# seria aceito a partir do cache.
+_token_cache = TTLCache(maxsize=10000, ttl=60)
+_token_cache_lock = threading.Lock()
+
 # Modelos Pydantic para autenticação
 class Token(BaseModel):
     access_token: str
@@ -60,26 +85,86 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+# Modelo para categorização de despesas
+class ExpenseIn(BaseModel):
+    api_key: str
+    description: str
+    stream: bool = False
+
+class ExpensesIn(BaseModel):
+    api_key: str
+    descriptions: List[str]
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title="IA Vertical para Contabilidade",
     description="API para IA especializada em contabilidade",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Configurar CORS
+# Configurar CORS: origens explícitas em produção (o wildcard fica
+# restrito a desenvolvimento) e preflight cacheado por 24h para
+# evitar um OPTIONS extra por requisição de navegador
+if os.getenv("ENV", "production") == "dev":
+    _cors_origins = ["*"]
+else:
+    _cors_origins = os.getenv("CORS_ORIGINS", "https://app.example.com").split(",")
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=_cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
+# Comprimir respostas JSON acima de 500 bytes (históricos, relatórios)
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
 # Diretório para uploads e dados
 os.makedirs("./uploads", exist_ok=True)
 os.makedirs("./data", exist_ok=True)
 
+# Tamanho do bloco usado ao gravar uploads em disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Tamanho máximo aceito para uploads
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+async def _save_upload(upload: UploadFile, dest: str):
+    """
+    Salva um UploadFile em disco copiando em blocos, sem carregar
+    o arquivo inteiro em memória nem bloquear o event loop. Rejeita
+    uploads acima de MAX_UPLOAD_BYTES com HTTP 413.
+    """
+    total = 0
+    async with aiofiles.open(dest, "wb") as f:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            total += len(chunk)
+            if total > MAX_UPLOAD_BYTES:
+                if os.path.exists(dest):
+                    os.remove(dest)
+                raise HTTPException(
+                    status_code=413,
+                    detail="Arquivo excede o tamanho máximo permitido"
+                )
+            await f.write(chunk)
+
+# Os mesmos mapeamentos e formatos de data chegam repetidamente dos
+# mesmos clientes; memoizar evita reparsear a cada importação
+
+@lru_cache(maxsize=128)
+def _parse_mapeamento(mapeamento: str) -> dict:
+    """Converte o JSON de mapeamento de colunas para dicionário."""
+    return orjson.loads(mapeamento)
+
+@lru_cache(maxsize=32)
+def _formato_data_python(formato_data: str) -> str:
+    """Converte o formato de data amigável (dd/mm/yyyy) para strptime."""
+    return formato_data.replace("dd", "%d").replace("mm", "%m").replace("yyyy", "%Y")
+
 # Inicializar componentes
 document_classifier = None
 chatbot = ContabilidadeChatbot()
@@ -88,6 +173,85 @@ conciliacao_bancaria = ConciliacaoBancaria()
 gestor_obrigacoes = GestorObrigacoes()
 analisador_tributario = AnalisadorTributario()
 
+# Cliente OpenAI único no escopo do módulo: reutiliza o pool de
+# conexões HTTP entre requisições em vez de refazer o handshake
+# TCP+TLS a cada chamada. A variante assíncrona libera o event loop
+# durante o round-trip ao modelo
+openai_client = openai.AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    ),
+)
+
+# Modelo de embeddings usado pelo cache semântico; uma chamada de
+# embedding é muito mais barata e rápida que uma de chat
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Cache semântico de categorias por similaridade de descrição
+semantic_cache = SemanticCache(threshold=0.92)
+
+# Lista fechada de categorias contábeis aceitas pela categorização.
+# Além de compor os prompts, serve de base para a rota barata por
+# embeddings: a descrição é comparada com o embedding de cada
+# categoria e só os casos de baixa confiança escalam para o chat
+CATEGORIAS = [
+    "Aluguel", "Energia Elétrica", "Água e Esgoto", "Telefonia e Internet",
+    "Material de Escritório", "Transporte", "Alimentação",
+    "Marketing e Publicidade", "Honorários Profissionais",
+    "Impostos e Taxas", "Salários e Encargos", "Manutenção e Reparos",
+    "Software e Tecnologia", "Viagens", "Outros",
+]
+
+# Prompt de sistema estático da categorização. Constante de módulo e
+# byte-idêntico entre chamadas (sem f-strings nem variação de
+# espaços), o que habilita o prompt caching automático do provedor
+# sobre o prefixo repetido
+SYSTEM_PROMPT = (
+    "Você é um assistente especializado em contabilidade brasileira. "
+    "Classifique a despesa informada em uma única categoria contábil, "
+    "como: Aluguel, Energia Elétrica, Água e Esgoto, Telefonia e Internet, "
+    "Material de Escritório, Transporte, Alimentação, Marketing e Publicidade, "
+    "Honorários Profissionais, Impostos e Taxas, Salários e Encargos, "
+    "Manutenção e Reparos, Software e Tecnologia, Viagens ou Outros. "
+    "Responda apenas com o nome da categoria."
+)
+
+# Variante JSON do prompt: com response_format json_object o modelo
+# devolve {"categoria": "..."} sem prosa ao redor, dispensando
+# pós-processamento e mantendo as respostas estáveis entre chamadas
+SYSTEM_PROMPT_JSON = (
+    SYSTEM_PROMPT + ' Responda em JSON no formato {"categoria": "..."}.'
+)
+
+SYSTEM_PROMPT_BATCH = (
+    "Você é um assistente especializado em contabilidade brasileira. "
+    "Classifique cada despesa da lista numerada em uma única categoria "
+    "contábil. Responda em JSON no formato "
+    '{"categorias": ["categoria da despesa 1", "categoria da despesa 2", ...]}, '
+    "com exatamente um item por despesa, na mesma ordem da lista."
+)
+
+# Cache exato de categorias por descrição normalizada: repetições
+# idênticas ("Aluguel escritório março") retornam em microssegundos,
+# sem pagar nem o embedding
+_categoria_cache = LRUCache(maxsize=10000)
+_categoria_cache_lock = threading.Lock()
+
+# Mensagens de sistema e template de usuário pré-montados: dispensa
+# realocar o dicionário do prompt e reinterpolar f-strings a cada
+# requisição, e mantém o prefixo da conversa byte-idêntico
+SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+SYSTEM_MSG_JSON = {"role": "system", "content": SYSTEM_PROMPT_JSON}
+SYSTEM_MSG_BATCH = {"role": "system", "content": SYSTEM_PROMPT_BATCH}
+_USER_TMPL = "Classifique esta despesa: %s"
+_USER_TMPL_BATCH = "Classifique estas despesas:\n%s"
+
+def _normalizar_descricao(descricao: str) -> str:
+    """Normaliza a descrição (minúsculas, espaços colapsados) para chave de cache."""
+    return " ".join(descricao.lower().split())
+
 # Funções de autenticação
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -95,26 +259,33 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def get_user(db: Session, email: str):
-    return db.query(db.Usuario).filter(db.Usuario.email == email).first()
+# Statement pré-compilado para a busca de usuário por email — o SELECT
+# mais quente da aplicação (login e toda requisição autenticada).
+# lambda_stmt permite ao SQLAlchemy reutilizar a compilação entre chamadas
+_GET_USER_STMT = lambda_stmt(
+    lambda: select(db.Usuario).where(db.Usuario.email == bindparam("email"))
+)
+
+def get_user(db_session: Session, email: str):
+    return db_session.execute(_GET_USER_STMT, {"email": email}).scalar_one_or_none()
 
-def authenticate_user(db: Session, email: str, password: str):
+async def authenticate_user(db: Session, email: str, password: str):
     user = get_user(db, email)
     if not user:
         return False
-    if not verify_password(password, user.senha_hash):
+    # A verificação do hash é cara e roda fora do event loop
+    if not await run_in_threadpool(verify_password, password, user.senha_hash):
         return False
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
+    # Usar time.time() evita construir objetos datetime por token, e o
+    # payload é montado em um único passo em vez de copiar e atualizar
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        exp = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+        exp = int(time.time()) + 15 * 60
+    return jwt.encode({**data, "exp": exp}, SECRET_KEY, algorithm=ALGORITHM)
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(db.get_db_session)):
     credentials_exception = HTTPException(
@@ -122,6 +293,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+    # Verificar primeiro o cache de tokens, checando a expiração antes
+    # de servir uma entrada cacheada
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None:
+        user, exp = cached
+        if exp > time.time():
+            return user
+        raise credentials_exception
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -133,6 +315,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user = get_user(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+
+    with _token_cache_lock:
+        _token_cache[token] = (user, payload.get("exp", 0))
+
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -143,7 +329,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 # Rota para autenticação
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(db.get_db_session)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -161,10 +347,9 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-# Rota raiz
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    return """
+# Página inicial pré-codificada uma única vez no carregamento do
+# módulo, evitando reencodar o HTML a cada requisição
+_ROOT_HTML = """
     <html>
         <head>
             <title>IA Vertical para Contabilidade</title>
@@ -202,16 +387,29 @@ async def root():
             </div>
         </body>
     </html>
-    """
+    """.encode("utf-8")
+
+# Rota raiz
+@app.get("/", response_class=HTMLResponse)
+async def root():
+    # Response nova a cada requisição: middlewares como o GZip mutam
+    # os headers da resposta in loco, então uma instância compartilhada
+    # vazaria Content-Encoding/Content-Length de uma requisição para as
+    # seguintes. Só o encode do HTML é pago uma única vez, no import
+    return Response(
+        content=_ROOT_HTML,
+        media_type="text/html",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
 
 # Rotas para usuários
 @app.post("/usuarios/", response_model=User)
-async def create_user(user: UserCreate, db: Session = Depends(db.get_db_session)):
-    db_user = get_user(db, email=user.email)
+async def create_user(user: UserCreate, db_session: Session = Depends(db.get_db_session)):
+    db_user = get_user(db_session, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email já registrado")
-    
-    hashed_password = get_password_hash(user.senha)
+
+    hashed_password = await run_in_threadpool(get_password_hash, user.senha)
     db_user = db.Usuario(
         email=user.email,
         nome=user.nome,
@@ -220,9 +418,9 @@ async def create_user(user: UserCreate, db: Session = Depends(db.get_db_session)
         empresa_id=user.empresa_id,
         ativo=True
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db_session.add(db_user)
+    db_session.commit()
+    db_session.refresh(db_user)
     return db_user
 
 @app.get("/usuarios/me/", response_model=User)
@@ -233,37 +431,18 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 @app.post("/documentos/classificar", tags=["Documentos"])
 async def classificar_documento(
     arquivo: UploadFile = File(...),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db_session: Session = Depends(db.get_db_session)
 ):
-    global document_classifier
-    
-    # Inicializar classificador se necessário
-    if document_classifier is None:
-        try:
-            # Tentar carregar modelo pré-treinado
-            model_path = "./data/document_classifier_model.pkl"
-            if os.path.exists(model_path):
-                document_classifier = DocumentClassifier(model_path=model_path)
-            else:
-                # Treinar modelo de exemplo
-                document_classifier = train_sample_model()
-                # Salvar modelo para uso futuro
-                os.makedirs(os.path.dirname(model_path), exist_ok=True)
-                document_classifier._save_model(model_path)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Erro ao inicializar classificador: {str(e)}")
-    
     # Salvar arquivo temporariamente
     file_path = f"./uploads/{arquivo.filename}"
-    with open(file_path, "wb") as f:
-        f.write(await arquivo.read())
-    
+    await _save_upload(arquivo, file_path)
+
     try:
         # Classificar documento
-        resultado = document_classifier.predict(file_path)
+        resultado = await run_in_threadpool(document_classifier.predict, file_path)
         
         # Salvar documento no banco de dados
-        db_session = db.get_db_session()
         documento = db.Documento(
             nome=arquivo.filename,
             tipo=resultado["category"],
@@ -276,8 +455,7 @@ async def classificar_documento(
         db_session.add(documento)
         db_session.commit()
         db_session.refresh(documento)
-        db_session.close()
-        
+
         return resultado
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao classificar documento: {str(e)}")
@@ -317,8 +495,16 @@ async def obter_historico_chat(
     db_session: Session = Depends(db.get_db_session)
 ):
     try:
-        # Buscar histórico do usuário no banco de dados
-        mensagens = db_session.query(db.ChatMensagem).filter(
+        # Buscar histórico do usuário no banco de dados, carregando
+        # apenas as colunas que entram na resposta
+        mensagens = db_session.query(
+            db.ChatMensagem.id,
+            db.ChatMensagem.mensagem,
+            db.ChatMensagem.resposta,
+            db.ChatMensagem.categoria,
+            db.ChatMensagem.confianca,
+            db.ChatMensagem.timestamp
+        ).filter(
             db.ChatMensagem.usuario_id == current_user.id
         ).order_by(db.ChatMensagem.timestamp.desc()).limit(50).all()
         
@@ -357,7 +543,7 @@ async def gerar_balanco(
         )
         
         # Gerar relatório
-        relatorio_path = report_generator.generate_balance_sheet(financial_data)
+        relatorio_path = await run_in_threadpool(report_generator.generate_balance_sheet, financial_data)
         
         # Retornar caminho do relatório
         return {"relatorio_path": relatorio_path}
@@ -382,7 +568,7 @@ async def gerar_dre(
         )
         
         # Gerar relatório
-        relatorio_path = report_generator.generate_income_statement(financial_data)
+        relatorio_path = await run_in_threadpool(report_generator.generate_income_statement, financial_data)
         
         # Retornar caminho do relatório
         return {"relatorio_path": relatorio_path}
@@ -401,7 +587,7 @@ async def gerar_fluxo_caixa(
         periodo = dados.get("periodo", "")
         
         # Gerar relatório
-        relatorio_path = report_generator.generate_cash_flow(fluxo_data, empresa, periodo)
+        relatorio_path = await run_in_threadpool(report_generator.generate_cash_flow, fluxo_data, empresa, periodo)
         
         # Retornar caminho do relatório
         return {"relatorio_path": relatorio_path}
@@ -409,100 +595,196 @@ async def gerar_fluxo_caixa(
         raise HTTPException(status_code=500, detail=f"Erro ao gerar fluxo de caixa: {str(e)}")
 
 # Rotas para conciliação bancária
-@app.post("/conciliacao/importar-extrato", tags=["Conciliação Bancária"])
+
+# Estado dos jobs de importação persistido no banco: com múltiplos
+# workers, o poll de status pode cair em um processo diferente do que
+# executa o job, então um dict por processo não funciona. Jobs mais
+# antigos que a retenção são descartados ao registrar novos, para o
+# estado não crescer sem limite
+JOB_RETENCAO = timedelta(days=1)
+
+def _job_registrar(job_id: str):
+    """Registra um job novo e descarta os mais antigos que a retenção."""
+    sessao = db.SessionLocal()
+    try:
+        sessao.query(db.JobImportacao).filter(
+            db.JobImportacao.criado_em < datetime.now() - JOB_RETENCAO
+        ).delete(synchronize_session=False)
+        sessao.add(db.JobImportacao(id=job_id, status="processando"))
+        sessao.commit()
+    finally:
+        sessao.close()
+
+def _job_atualizar(job_id: str, status: str, **campos):
+    """Atualiza o status de um job, com campos extras serializados em JSON."""
+    sessao = db.SessionLocal()
+    try:
+        sessao.query(db.JobImportacao).filter(db.JobImportacao.id == job_id).update({
+            "status": status,
+            "detalhe": orjson.dumps(campos).decode() if campos else None,
+        })
+        sessao.commit()
+    finally:
+        sessao.close()
+
+def _job_obter(job_id: str) -> Optional[Dict[str, Any]]:
+    """Retorna o status de um job como dicionário, ou None se não existir."""
+    sessao = db.SessionLocal()
+    try:
+        job = sessao.get(db.JobImportacao, job_id)
+    finally:
+        sessao.close()
+    if job is None:
+        return None
+    resultado = {"status": job.status}
+    if job.detalhe:
+        resultado.update(orjson.loads(job.detalhe))
+    return resultado
+
+def _processar_extrato(job_id: str, file_path: str, mapeamento_dict: dict, formato_data_python: str, empresa_id: Optional[int]):
+    """Processa a importação de extrato bancário em segundo plano."""
+    db_session = db.SessionLocal()
+    try:
+        count = conciliacao_bancaria.importar_extrato_bancario(file_path, mapeamento_dict, formato_data_python)
+
+        # Salvar transações no banco de dados em um único INSERT em lote
+        rows = [
+            {
+                "data": transacao.data,
+                "descricao": transacao.descricao,
+                "valor": transacao.valor,
+                "tipo": transacao.tipo,
+                "id_transacao": transacao.id_transacao,
+                "conciliada": transacao.conciliada,
+                "id_correspondente": transacao.id_correspondente,
+                "empresa_id": empresa_id
+            }
+            for transacao in conciliacao_bancaria.transacoes_bancarias
+        ]
+        if rows:
+            db_session.execute(db.TransacaoBancaria.__table__.insert(), rows)
+
+        db_session.commit()
+
+        _job_atualizar(job_id, "concluido", transacoes_importadas=count)
+    except Exception as e:
+        db_session.rollback()
+        _job_atualizar(job_id, "erro", detalhe=str(e))
+    finally:
+        db_session.close()
+        # Limpar arquivo temporário
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def _processar_lancamentos(job_id: str, file_path: str, mapeamento_dict: dict, formato_data_python: str, empresa_id: Optional[int]):
+    """Processa a importação de lançamentos contábeis em segundo plano."""
+    db_session = db.SessionLocal()
+    try:
+        count = conciliacao_bancaria.importar_lancamentos_contabeis(file_path, mapeamento_dict, formato_data_python)
+
+        # Salvar lançamentos no banco de dados em um único INSERT em lote
+        rows = [
+            {
+                "data": lancamento.data,
+                "descricao": lancamento.descricao,
+                "valor": lancamento.valor,
+                "tipo": lancamento.tipo,
+                "id_lancamento": lancamento.id_lancamento,
+                "conta_contabil": lancamento.conta_contabil,
+                "conciliado": lancamento.conciliado,
+                "id_correspondente": lancamento.id_correspondente,
+                "empresa_id": empresa_id
+            }
+            for lancamento in conciliacao_bancaria.lancamentos_contabeis
+        ]
+        if rows:
+            db_session.execute(db.LancamentoContabil.__table__.insert(), rows)
+
+        db_session.commit()
+
+        _job_atualizar(job_id, "concluido", lancamentos_importados=count)
+    except Exception as e:
+        db_session.rollback()
+        _job_atualizar(job_id, "erro", detalhe=str(e))
+    finally:
+        db_session.close()
+        # Limpar arquivo temporário
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+@app.post("/conciliacao/importar-extrato", status_code=202, tags=["Conciliação Bancária"])
 async def importar_extrato(
+    background_tasks: BackgroundTasks,
     arquivo: UploadFile = File(...),
     mapeamento: str = Form(...),
     formato_data: str = Form("dd/mm/yyyy"),
-    current_user: User = Depends(get_current_active_user),
-    db_session: Session = Depends(db.get_db_session)
+    current_user: User = Depends(get_current_active_user)
 ):
     try:
         # Salvar arquivo temporariamente
         file_path = f"./uploads/{arquivo.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await arquivo.read())
-        
-        # Converter mapeamento para dicionário
-        mapeamento_dict = json.loads(mapeamento)
-        
-        # Converter formato de data
-        formato_data_python = formato_data.replace("dd", "%d").replace("mm", "%m").replace("yyyy", "%Y")
-        
-        # Importar extrato
-        count = conciliacao_bancaria.importar_extrato_bancario(file_path, mapeamento_dict, formato_data_python)
-        
-        # Salvar transações no banco de dados
-        for transacao in conciliacao_bancaria.transacoes_bancarias:
-            db_transacao = db.TransacaoBancaria(
-                data=transacao.data,
-                descricao=transacao.descricao,
-                valor=transacao.valor,
-                tipo=transacao.tipo,
-                id_transacao=transacao.id_transacao,
-                conciliada=transacao.conciliada,
-                id_correspondente=transacao.id_correspondente,
-                empresa_id=current_user.empresa_id
-            )
-            db_session.add(db_transacao)
-        
-        db_session.commit()
-        
-        return {"transacoes_importadas": count}
+        await _save_upload(arquivo, file_path)
+
+        # Converter mapeamento e formato de data
+        mapeamento_dict = _parse_mapeamento(mapeamento)
+        formato_data_python = _formato_data_python(formato_data)
+
+        # Processar em segundo plano: a resposta volta assim que o
+        # arquivo está salvo, sem esperar o parse e os INSERTs
+        job_id = uuid4().hex
+        await run_in_threadpool(_job_registrar, job_id)
+        background_tasks.add_task(
+            _processar_extrato, job_id, file_path, mapeamento_dict,
+            formato_data_python, current_user.empresa_id
+        )
+
+        return {"status": "accepted", "job_id": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao importar extrato: {str(e)}")
-    finally:
-        # Limpar arquivo temporário
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
-@app.post("/conciliacao/importar-lancamentos", tags=["Conciliação Bancária"])
+@app.post("/conciliacao/importar-lancamentos", status_code=202, tags=["Conciliação Bancária"])
 async def importar_lancamentos(
+    background_tasks: BackgroundTasks,
     arquivo: UploadFile = File(...),
     mapeamento: str = Form(...),
     formato_data: str = Form("dd/mm/yyyy"),
-    current_user: User = Depends(get_current_active_user),
-    db_session: Session = Depends(db.get_db_session)
+    current_user: User = Depends(get_current_active_user)
 ):
     try:
         # Salvar arquivo temporariamente
         file_path = f"./uploads/{arquivo.filename}"
-        with open(file_path, "wb") as f:
-            f.write(await arquivo.read())
-        
-        # Converter mapeamento para dicionário
-        mapeamento_dict = json.loads(mapeamento)
-        
-        # Converter formato de data
-        formato_data_python = formato_data.replace("dd", "%d").replace("mm", "%m").replace("yyyy", "%Y")
-        
-        # Importar lançamentos
-        count = conciliacao_bancaria.importar_lancamentos_contabeis(file_path, mapeamento_dict, formato_data_python)
-        
-        # Salvar lançamentos no banco de dados
-        for lancamento in conciliacao_bancaria.lancamentos_contabeis:
-            db_lancamento = db.LancamentoContabil(
-                data=lancamento.data,
-                descricao=lancamento.descricao,
-                valor=lancamento.valor,
-                tipo=lancamento.tipo,
-                id_lancamento=lancamento.id_lancamento,
-                conta_contabil=lancamento.conta_contabil,
-                conciliado=lancamento.conciliado,
-                id_correspondente=lancamento.id_correspondente,
-                empresa_id=current_user.empresa_id
-            )
-            db_session.add(db_lancamento)
-        
-        db_session.commit()
-        
-        return {"lancamentos_importados": count}
+        await _save_upload(arquivo, file_path)
+
+        # Converter mapeamento e formato de data
+        mapeamento_dict = _parse_mapeamento(mapeamento)
+        formato_data_python = _formato_data_python(formato_data)
+
+        # Processar em segundo plano: a resposta volta assim que o
+        # arquivo está salvo, sem esperar o parse e os INSERTs
+        job_id = uuid4().hex
+        await run_in_threadpool(_job_registrar, job_id)
+        background_tasks.add_task(
+            _processar_lancamentos, job_id, file_path, mapeamento_dict,
+            formato_data_python, current_user.empresa_id
+        )
+
+        return {"status": "accepted", "job_id": job_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao importar lançamentos: {str(e)}")
-    finally:
-        # Limpar arquivo temporário
-        if os.path.exists(file_path):
-            os.remove(file_path)
+
+@app.get("/conciliacao/job/{job_id}", tags=["Conciliação Bancária"])
+async def status_importacao(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    job = await run_in_threadpool(_job_obter, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
 
 @app.post("/conciliacao/conciliar-automatico", tags=["Conciliação Bancária"])
 async def conciliar_automatico(
@@ -510,7 +792,9 @@ async def conciliar_automatico(
     current_user: User = Depends(get_current_active_user)
 ):
     try:
-        conciliacoes = conciliacao_bancaria.conciliar_automaticamente(limiar)
+        # A conciliação é CPU-bound (comparação n x m); rodar fora do
+        # event loop para não serializar as demais requisições
+        conciliacoes = await run_in_threadpool(conciliacao_bancaria.conciliar_automaticamente, limiar)
         return {"conciliacoes": conciliacoes}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao conciliar: {str(e)}")
@@ -533,13 +817,14 @@ async def adicionar_obrigacao(
     db_session: Session = Depends(db.get_db_session)
 ):
     try:
-        # Converter data de vencimento
-        data_vencimento = datetime.fromisoformat(dados["data_vencimento"]).date()
-        
+        # Converter data de vencimento (o slice de 10 caracteres aceita
+        # também timestamps completos como "2024-03-01T00:00:00")
+        data_vencimento = date.fromisoformat(dados["data_vencimento"][:10])
+
         # Converter data de conclusão, se existir
         data_conclusao = None
         if "data_conclusao" in dados and dados["data_conclusao"]:
-            data_conclusao = datetime.fromisoformat(dados["data_conclusao"]).date()
+            data_conclusao = date.fromisoformat(dados["data_conclusao"][:10])
         
         # Criar objeto Obrigacao para o gestor
         obrigacao = Obrigacao(
@@ -596,13 +881,25 @@ async def obrigacoes_proximos_dias(
         hoje = date.today()
         data_limite = hoje + timedelta(days=dias)
         
-        db_obrigacoes = db_session.query(db.Obrigacao).filter(
+        # Buscar apenas as colunas serializadas abaixo, evitando
+        # hidratar objetos ORM completos
+        db_obrigacoes = db_session.query(
+            db.Obrigacao.id,
+            db.Obrigacao.nome,
+            db.Obrigacao.descricao,
+            db.Obrigacao.data_vencimento,
+            db.Obrigacao.status,
+            db.Obrigacao.prioridade,
+            db.Obrigacao.responsavel,
+            db.Obrigacao.empresa_id,
+            db.Obrigacao.categoria
+        ).filter(
             db.Obrigacao.empresa_id == current_user.empresa_id,
             db.Obrigacao.data_vencimento >= hoje,
             db.Obrigacao.data_vencimento <= data_limite,
             db.Obrigacao.status != "concluida"
         ).all()
-        
+
         # Converter para formato serializável
         obrigacoes_dict = [
             {
@@ -724,12 +1021,429 @@ async def relatorio_tributario(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar relatório: {str(e)}")
 
-# Inicializar banco de dados
+# Rotas para categorização de despesas
+
+# Mapa de requisições em voo por descrição normalizada: chamadas
+# concorrentes com a mesma descrição inédita aguardam o mesmo future
+# em vez de disparar chamadas independentes ao modelo
+_inflight: Dict[str, asyncio.Future] = {}
+_inflight_lock = asyncio.Lock()
+
+# Embeddings L2-normalizados das categorias, calculados uma vez por
+# worker na primeira categorização. Comparar a descrição com eles é
+# ~100x mais barato (e bem mais rápido) que uma completion de chat
+_categoria_vecs = None
+_categoria_vecs_lock = asyncio.Lock()
+
+# Limiares da rota por kNN: abaixo deles a classificação escala para
+# o modelo de chat em vez de arriscar uma categoria errada
+KNN_SCORE_MINIMO = 0.35
+KNN_MARGEM_MINIMA = 0.05
+
+async def _vetores_categorias():
+    """Retorna (calculando uma única vez) a matriz de embeddings das categorias."""
+    global _categoria_vecs
+    if _categoria_vecs is None:
+        async with _categoria_vecs_lock:
+            if _categoria_vecs is None:
+                resp = await openai_client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=CATEGORIAS
+                )
+                matriz = np.asarray([d.embedding for d in resp.data], dtype=np.float32)
+                matriz /= np.linalg.norm(matriz, axis=1, keepdims=True)
+                _categoria_vecs = matriz
+    return _categoria_vecs
+
+def _categoria_por_knn(embedding, vetores):
+    """
+    Escolhe a categoria de embedding mais próximo da descrição.
+
+    Returns:
+        str: Categoria vencedora, ou None se o score ficar abaixo do
+        mínimo ou a margem sobre a segunda colocada for apertada
+    """
+    vec = np.asarray(embedding, dtype=np.float32)
+    norma = np.linalg.norm(vec)
+    if norma:
+        vec = vec / norma
+    scores = vetores @ vec
+    ordem = np.argsort(scores)
+    melhor = float(scores[ordem[-1]])
+    segunda = float(scores[ordem[-2]])
+    if melhor >= KNN_SCORE_MINIMO and melhor - segunda >= KNN_MARGEM_MINIMA:
+        return CATEGORIAS[int(ordem[-1])]
+    return None
+
+async def _categorizar_despesa(descricao: str, chave: str) -> str:
+    """
+    Resolve a categoria de uma despesa: consulta o cache semântico e,
+    em último caso, o modelo de chat, populando os caches no retorno.
+    """
+    # Consultar o cache semântico antes de chamar o modelo de chat:
+    # descrições similares reaproveitam a categoria já respondida
+    emb_resp = await openai_client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=descricao
+    )
+    embedding = emb_resp.data[0].embedding
+
+    categoria_cache = semantic_cache.get(embedding)
+    if categoria_cache is not None:
+        with _categoria_cache_lock:
+            _categoria_cache[chave] = categoria_cache
+        return categoria_cache
+
+    # Rota barata: kNN sobre os embeddings das categorias resolve os
+    # casos claros; só a baixa confiança paga o modelo de chat
+    categoria_knn = _categoria_por_knn(embedding, await _vetores_categorias())
+    if categoria_knn is not None:
+        semantic_cache.add(embedding, categoria_knn)
+        with _categoria_cache_lock:
+            _categoria_cache[chave] = categoria_knn
+        return categoria_knn
+
+    resposta = await openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        max_tokens=16,
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=[SYSTEM_MSG_JSON, {"role": "user", "content": _USER_TMPL % descricao}]
+    )
+    categoria = orjson.loads(resposta.choices[0].message.content)["categoria"]
+
+    semantic_cache.add(embedding, categoria)
+    with _categoria_cache_lock:
+        _categoria_cache[chave] = categoria
+    return categoria
+
+async def _stream_categoria(descricao: str, chave: str):
+    """
+    Gera a categoria em texto puro, token a token. Acertos de cache
+    saem em um único chunk; descrições inéditas repassam os deltas do
+    modelo conforme chegam e populam os caches ao final.
+    """
+    with _categoria_cache_lock:
+        categoria_exata = _categoria_cache.get(chave)
+    if categoria_exata is not None:
+        yield categoria_exata
+        return
+
+    emb_resp = await openai_client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=descricao
+    )
+    embedding = emb_resp.data[0].embedding
+
+    categoria_cache = semantic_cache.get(embedding)
+    if categoria_cache is not None:
+        with _categoria_cache_lock:
+            _categoria_cache[chave] = categoria_cache
+        yield categoria_cache
+        return
+
+    categoria_knn = _categoria_por_knn(embedding, await _vetores_categorias())
+    if categoria_knn is not None:
+        semantic_cache.add(embedding, categoria_knn)
+        with _categoria_cache_lock:
+            _categoria_cache[chave] = categoria_knn
+        yield categoria_knn
+        return
+
+    fluxo = await openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        max_tokens=8,
+        temperature=0,
+        stream=True,
+        messages=[SYSTEM_MSG, {"role": "user", "content": _USER_TMPL % descricao}]
+    )
+    partes = []
+    async for pedaco in fluxo:
+        delta = pedaco.choices[0].delta.content if pedaco.choices else None
+        if delta:
+            partes.append(delta)
+            yield delta
+
+    categoria = "".join(partes).strip()
+    if categoria:
+        semantic_cache.add(embedding, categoria)
+        with _categoria_cache_lock:
+            _categoria_cache[chave] = categoria
+
+@app.post("/categorize", tags=["Categorização"])
+async def categorize_expense(item: ExpenseIn):
+    # Validação e consumo de uso em um único UPDATE atômico
+    if not await run_in_threadpool(db.check_and_increment_usage, item.api_key):
+        raise HTTPException(status_code=401, detail="Chave de API inválida ou limite de uso excedido")
+
+    chave = _normalizar_descricao(item.description)
+
+    # Streaming opcional: o cliente recebe o primeiro token assim que
+    # o modelo o emite, em vez de esperar a completion inteira
+    if item.stream:
+        return StreamingResponse(
+            _stream_categoria(item.description, chave),
+            media_type="text/plain"
+        )
+
+    # Cache exato primeiro: é a classe mais barata de repetição
+    with _categoria_cache_lock:
+        categoria_exata = _categoria_cache.get(chave)
+    if categoria_exata is not None:
+        return {"categoria": categoria_exata}
+
+    try:
+        # Single-flight: a primeira requisição de uma descrição inédita
+        # resolve a categoria; as concorrentes aguardam o mesmo future
+        async with _inflight_lock:
+            fut = _inflight.get(chave)
+            vencedora = fut is None
+            if vencedora:
+                fut = asyncio.get_running_loop().create_future()
+                _inflight[chave] = fut
+
+        if vencedora:
+            try:
+                categoria = await _categorizar_despesa(item.description, chave)
+                fut.set_result(categoria)
+            except Exception as e:
+                fut.set_exception(e)
+                # Marcar a exceção como observada: sem requisições
+                # concorrentes aguardando o future, o asyncio emitiria
+                # "Future exception was never retrieved" ao coletá-lo
+                fut.exception()
+                raise
+            finally:
+                async with _inflight_lock:
+                    _inflight.pop(chave, None)
+        else:
+            categoria = await fut
+
+        return {"categoria": categoria}
+    except Exception as e:
+        raise _erro_openai_para_http(e)
+
+def _erro_openai_para_http(e: Exception) -> HTTPException:
+    """
+    Traduz falhas da API da OpenAI no status HTTP apropriado, para que
+    retries e circuit breakers do cliente reajam ao código em vez de
+    receber um 200 com corpo de erro.
+    """
+    if isinstance(e, openai.RateLimitError):
+        return HTTPException(
+            status_code=429,
+            detail="Limite de taxa do provedor excedido",
+            headers={"Retry-After": "5"}
+        )
+    if isinstance(e, openai.APITimeoutError):
+        return HTTPException(status_code=504, detail="Tempo limite na chamada ao provedor")
+    if isinstance(e, openai.APIConnectionError):
+        return HTTPException(status_code=502, detail="Falha de conexão com o provedor")
+    return HTTPException(status_code=500, detail=f"Erro ao categorizar despesa: {str(e)}")
+
+# Despacho paralelo com consciência de limites: lotes grandes são
+# fatiados em sub-lotes enviados em paralelo, mas com concorrência
+# máxima e espaçamento mínimo entre disparos para caber no orçamento
+# de requisições/minuto da API; erros transitórios sofrem retry com
+# backoff exponencial e jitter
+BATCH_TAMANHO_SUBLOTE = 20
+BATCH_CONCORRENCIA = 8
+BATCH_RPM = 240
+BATCH_TENTATIVAS = 6
+_batch_sem = asyncio.Semaphore(BATCH_CONCORRENCIA)
+_batch_intervalo = 60.0 / BATCH_RPM
+_batch_proximo_disparo = 0.0
+_batch_disparo_lock = asyncio.Lock()
+
+async def _aguardar_slot_rpm():
+    """Espaça os disparos para respeitar o orçamento de requisições/minuto."""
+    global _batch_proximo_disparo
+    async with _batch_disparo_lock:
+        agora = time.monotonic()
+        espera = _batch_proximo_disparo - agora
+        _batch_proximo_disparo = max(agora, _batch_proximo_disparo) + _batch_intervalo
+    if espera > 0:
+        await asyncio.sleep(espera)
+
+async def _completar_com_retry(**kwargs):
+    """Chama o chat através do limitador, com retry para erros transitórios."""
+    for tentativa in range(BATCH_TENTATIVAS):
+        async with _batch_sem:
+            await _aguardar_slot_rpm()
+            try:
+                return await openai_client.chat.completions.create(**kwargs)
+            except (openai.RateLimitError, openai.APIError):
+                if tentativa == BATCH_TENTATIVAS - 1:
+                    raise
+        await asyncio.sleep(min(30.0, 2 ** tentativa + random.random()))
+
+async def _categorizar_sublote(descricoes: List[str]) -> List[str]:
+    """Categoriza um sub-lote de despesas em uma única completion."""
+    lista = "\n".join(f"{i + 1}. {d}" for i, d in enumerate(descricoes))
+    resposta = await _completar_com_retry(
+        model="gpt-4o-mini",
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=[SYSTEM_MSG_BATCH, {"role": "user", "content": _USER_TMPL_BATCH % lista}]
+    )
+    dados = orjson.loads(resposta.choices[0].message.content)
+    categorias = dados.get("categorias", [])
+    # Sem esta checagem, um item a mais ou a menos em qualquer
+    # sub-lote deslocaria silenciosamente todas as categorias
+    # seguintes no achatamento do resultado
+    if len(categorias) != len(descricoes):
+        raise ValueError(
+            f"modelo retornou {len(categorias)} categorias para {len(descricoes)} despesas"
+        )
+    return categorias
+
+@app.post("/categorize_batch", tags=["Categorização"])
+async def categorize_batch(items: ExpensesIn):
+    # Validação e consumo de uso em um único UPDATE atômico
+    if not await run_in_threadpool(db.check_and_increment_usage, items.api_key):
+        raise HTTPException(status_code=401, detail="Chave de API inválida ou limite de uso excedido")
+
+    if not items.descriptions:
+        return {"categorias": []}
+
+    try:
+        # Fatiar e despachar em paralelo pelo limitador: sub-lotes
+        # pequenos mantêm o prompt curto e a latência previsível,
+        # enquanto o limitador impede estourar RPM em lotes grandes
+        sublotes = [
+            items.descriptions[i:i + BATCH_TAMANHO_SUBLOTE]
+            for i in range(0, len(items.descriptions), BATCH_TAMANHO_SUBLOTE)
+        ]
+        resultados = await asyncio.gather(*(_categorizar_sublote(s) for s in sublotes))
+        categorias = [c for parcial in resultados for c in parcial]
+
+        return {"categorias": categorias}
+    except Exception as e:
+        raise _erro_openai_para_http(e)
+
+@app.post("/categorize_bulk", status_code=202, tags=["Categorização"])
+async def categorize_bulk(items: ExpensesIn):
+    """
+    Envia um lote de despesas pela Batch API da OpenAI (custo 50%
+    menor e limites de taxa separados). Indicado para cargas que
+    toleram retorno em minutos/horas, como importações mensais.
+    """
+    if not await run_in_threadpool(db.check_and_increment_usage, items.api_key):
+        raise HTTPException(status_code=401, detail="Chave de API inválida ou limite de uso excedido")
+
+    if not items.descriptions:
+        raise HTTPException(status_code=400, detail="Nenhuma despesa informada")
+
+    try:
+        # Montar o JSONL de requisições, uma linha por despesa
+        linhas = [
+            orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": "gpt-4o-mini",
+                    "messages": [
+                        SYSTEM_MSG,
+                        {"role": "user", "content": _USER_TMPL % d}
+                    ]
+                }
+            }).decode()
+            for i, d in enumerate(items.descriptions)
+        ]
+        conteudo = "\n".join(linhas).encode("utf-8")
+
+        arquivo = await openai_client.files.create(
+            file=("categorize_bulk.jsonl", conteudo),
+            purpose="batch"
+        )
+        batch = await openai_client.batches.create(
+            input_file_id=arquivo.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+        return {"batch_id": batch.id, "status": batch.status}
+    except Exception as e:
+        raise _erro_openai_para_http(e)
+
+@app.get("/categorize_bulk/{batch_id}", tags=["Categorização"])
+async def categorize_bulk_resultado(batch_id: str, api_key: str = Query(...)):
+    """Consulta o status de um lote e, quando concluído, retorna as categorias."""
+    if not await run_in_threadpool(db.validate_api_key, api_key):
+        raise HTTPException(status_code=401, detail="Chave de API inválida ou limite de uso excedido")
+
+    try:
+        batch = await openai_client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            return {"batch_id": batch.id, "status": batch.status}
+
+        conteudo = await openai_client.files.content(batch.output_file_id)
+
+        # Resultados chegam por custom_id, não necessariamente em ordem
+        categorias = {}
+        for linha in conteudo.text.splitlines():
+            if not linha.strip():
+                continue
+            registro = orjson.loads(linha)
+            conteudo_resposta = registro["response"]["body"]["choices"][0]["message"]["content"]
+            categorias[registro["custom_id"]] = conteudo_resposta.strip()
+
+        # O arquivo de saída só traz as linhas bem-sucedidas (falhas
+        # vão para error_file_id), então o tamanho do resultado vem do
+        # maior custom_id presente, não da contagem de linhas; posições
+        # que falharam ficam como None, preservando o alinhamento com
+        # as despesas enviadas
+        total = max(int(k) for k in categorias) + 1 if categorias else 0
+        ordenadas = [categorias.get(str(i)) for i in range(total)]
+
+        return {"batch_id": batch.id, "status": batch.status, "categorias": ordenadas}
+    except Exception as e:
+        raise _erro_openai_para_http(e)
+
+# Inicializar banco de dados e componentes
 @app.on_event("startup")
 async def startup_event():
-    db.initialize_database_with_sample_data()
+    global document_classifier
+
+    # Ampliar o thread pool padrão usado por run_in_threadpool,
+    # já que classificação e relatórios rodam fora do event loop
+    to_thread.current_default_thread_limiter().total_tokens = 64
+
+    # DDL e carga de exemplo rodam uma vez no startup, fora do caminho
+    # de import e sem bloquear o event loop
+    await run_in_threadpool(db.create_tables)
+    await run_in_threadpool(db.initialize_database_with_sample_data)
+
+    # Falhar no startup, e não na primeira requisição, se o banco de
+    # clientes da API não estiver acessível
+    await run_in_threadpool(db.verificar_clients_db)
+
+    # Carregar o classificador de documentos uma única vez por worker,
+    # fora do caminho das requisições
+    model_path = "./data/document_classifier_model.pkl"
+    if os.path.exists(model_path):
+        document_classifier = DocumentClassifier(model_path=model_path)
+    else:
+        # Treinar modelo de exemplo e salvar para uso futuro
+        document_classifier = train_sample_model()
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        document_classifier._save_model(model_path)
+
+# Encerrar recursos compartilhados
+@app.on_event("shutdown")
+async def shutdown_event():
+    await openai_client.close()
 
 # Iniciar servidor se executado diretamente
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=os.cpu_count(),
+        reload=False
+    )
 
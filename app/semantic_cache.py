@@ -0,0 +1,79 @@
+"""
+Cache semântico para a categorização de despesas.
+Guarda embeddings de descrições já categorizadas e responde por
+similaridade de cosseno, evitando repetir chamadas ao modelo para
+descrições equivalentes ("Uber para reunião" / "uber reunião cliente").
+"""
+
+import threading
+import numpy as np
+
+class SemanticCache:
+    """
+    Cache em memória de pares (embedding, categoria) com busca por
+    cosseno. Limitado a max_entries por worker: ao encher, as entradas
+    mais antigas são sobrescritas em ordem circular. A matriz cresce em
+    blocos pré-alocados, então inserir não copia o cache inteiro.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 10000, block_size: int = 256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.block_size = block_size
+        # Matriz (capacidade, dim) com linhas L2-normalizadas; o produto
+        # escalar com um vetor normalizado equivale à similaridade de
+        # cosseno. Apenas as primeiras _size linhas estão preenchidas
+        self._vectors = None
+        self._categorias = []
+        self._size = 0
+        self._proxima = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, embedding):
+        """
+        Busca a categoria da entrada mais similar ao embedding.
+
+        Returns:
+            str: Categoria cacheada, ou None se nenhuma entrada passar do limiar
+        """
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._size == 0:
+                return None
+            scores = self._vectors[:self._size] @ vec
+            idx = int(np.argmax(scores))
+            if scores[idx] >= self.threshold:
+                return self._categorias[idx]
+        return None
+
+    def add(self, embedding, categoria):
+        """Adiciona um par (embedding, categoria), sobrescrevendo a entrada mais antiga se cheio."""
+        vec = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None:
+                capacidade = min(self.block_size, self.max_entries)
+                self._vectors = np.empty((capacidade, vec.shape[0]), dtype=np.float32)
+            elif self._size == self._vectors.shape[0] and self._size < self.max_entries:
+                # Crescer em blocos: uma realocação a cada block_size
+                # inserções, em vez de uma cópia da matriz por add
+                capacidade = min(self._size + self.block_size, self.max_entries)
+                nova = np.empty((capacidade, self._vectors.shape[1]), dtype=np.float32)
+                nova[:self._size] = self._vectors[:self._size]
+                self._vectors = nova
+
+            if self._size < self._vectors.shape[0]:
+                self._vectors[self._size] = vec
+                self._categorias.append(categoria)
+                self._size += 1
+            else:
+                # Capacidade máxima: sobrescrever em ordem circular
+                pos = self._proxima
+                self._proxima = (pos + 1) % self.max_entries
+                self._vectors[pos] = vec
+                self._categorias[pos] = categoria
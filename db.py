@@ -4,12 +4,33 @@ Gerencia conexões e operações com o banco de dados.
 """
 
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Date
+import sqlite3
+import threading
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Date, Index
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from cachetools import TTLCache
 import json
 
+# PRAGMAs de desempenho aplicados a cada nova conexão SQLite:
+# WAL permite leituras concorrentes com escritas, synchronous=NORMAL
+# evita um fsync por commit, e o restante reduz I/O de disco
+@event.listens_for(Engine, "connect")
+def _configurar_pragmas_sqlite(dbapi_conn, connection_record):
+    if isinstance(dbapi_conn, sqlite3.Connection):
+        cursor = dbapi_conn.cursor()
+        cursor.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "PRAGMA busy_timeout=5000;"
+            "PRAGMA cache_size=-20000;"
+            "PRAGMA temp_store=MEMORY;"
+        )
+        cursor.close()
+
 # Criar base declarativa
 Base = declarative_base()
 
@@ -65,7 +86,11 @@ class Documento(Base):
 class Obrigacao(Base):
     """Modelo para obrigações fiscais."""
     __tablename__ = "obrigacoes"
-    
+    # Índice composto que cobre o filtro de /obrigacoes/proximos-dias
+    __table_args__ = (
+        Index("ix_obrig_empresa_status_venc", "empresa_id", "status", "data_vencimento"),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(100), nullable=False)
     descricao = Column(Text)
@@ -147,49 +172,221 @@ class ChatMensagem(Base):
     
     usuario = relationship("Usuario")
 
-# Função para criar conexão com o banco de dados
+class JobImportacao(Base):
+    """
+    Modelo para o status de jobs de importação em segundo plano.
+    Persistido no banco (e não em um dict por processo) para que o
+    poll de status funcione com múltiplos workers do uvicorn.
+    """
+    __tablename__ = "jobs_importacao"
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default="processando")
+    detalhe = Column(Text, nullable=True)
+    criado_em = Column(DateTime, default=datetime.now)
+
+# Índice que cobre a busca de histórico por usuário ordenada do mais
+# recente para o mais antigo (/chatbot/historico)
+Index("ix_chat_usuario_ts", ChatMensagem.usuario_id, ChatMensagem.timestamp.desc())
+
+# URL do banco de dados (pode ser sobrescrita por variável de ambiente)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./contabilidade_ia.db")
+
+# Engine único no escopo do módulo com pool de conexões: as sessões
+# passam a reutilizar conexões em vez de abrir uma nova por requisição
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=QueuePool,
+    pool_size=20,
+    max_overflow=10,
+    pool_pre_ping=True,
+    query_cache_size=1200,
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+)
+
+# Flag de processo para não reemitir o DDL (e seus probes em
+# sqlite_master) depois da primeira chamada
+_tables_created = False
+
+def create_tables():
+    """
+    Cria as tabelas do banco caso ainda não existam. Idempotente por
+    processo: deve ser chamada no startup da aplicação, fora do
+    caminho de import e das requisições.
+    """
+    global _tables_created
+    if _tables_created:
+        return
+    Base.metadata.create_all(bind=engine)
+    # create_all pula tabelas que já existem, então bancos criados
+    # antes dos índices compostos de obrigações e de chat nunca os
+    # ganhariam; criá-los explicitamente cobre também esses bancos
+    for tabela in (Obrigacao.__table__, ChatMensagem.__table__):
+        for indice in tabela.indexes:
+            indice.create(bind=engine, checkfirst=True)
+    _tables_created = True
+
+# Fábrica de sessões compartilhada. expire_on_commit=False mantém os
+# atributos carregados após o commit, permitindo usar instâncias fora
+# da sessão (por exemplo, usuários cacheados entre requisições)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Função para obter a conexão com o banco de dados
 def get_database_connection():
     """
-    Cria e retorna uma conexão com o banco de dados.
-    
+    Retorna o engine e a fábrica de sessões do módulo.
+
     Returns:
-        Tuple[Engine, Session]: Engine e Session do SQLAlchemy
+        Tuple[Engine, sessionmaker]: Engine e fábrica de sessões do SQLAlchemy
     """
-    # Verificar se existe variável de ambiente para a URL do banco de dados
-    database_url = os.getenv("DATABASE_URL", "sqlite:///./contabilidade_ia.db")
-    
-    # Criar engine
-    engine = create_engine(database_url)
-    
-    # Criar tabelas se não existirem
-    Base.metadata.create_all(bind=engine)
-    
-    # Criar sessão
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
     return engine, SessionLocal
 
 # Função para obter uma sessão do banco de dados
 def get_db_session():
     """
     Obtém uma sessão do banco de dados.
-    
-    Returns:
+
+    Yields:
         Session: Sessão do SQLAlchemy
     """
-    _, SessionLocal = get_database_connection()
     db = SessionLocal()
     try:
-        return db
+        yield db
     finally:
         db.close()
 
+# Banco de clientes da API (chaves e limites de uso), mantido em um
+# SQLite separado e alimentado por app/add_cliente.py. O caminho
+# padrão é relativo a este módulo, não ao CWD do processo: o arquivo
+# acompanha o repositório em app/clients.db e um padrão relativo ao
+# CWD criaria silenciosamente um banco vazio ao rodar da raiz
+CLIENTS_DB_PATH = os.getenv(
+    "CLIENTS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "clients.db")
+)
+
+# Conexão única e de vida longa com o banco de clientes: abrir e
+# fechar o arquivo (e reparsear o schema) a cada chamada custava
+# alguns milissegundos por requisição. WAL permite leitores durante
+# escritas e isolation_level=None deixa o SQLite em autocommit. O
+# lock serializa o acesso, já que check_same_thread=False permite
+# uso a partir de múltiplas threads
+_clients_conn = sqlite3.connect(CLIENTS_DB_PATH, check_same_thread=False, isolation_level=None)
+_clients_conn.execute("PRAGMA journal_mode=WAL")
+_clients_conn.execute("PRAGMA synchronous=NORMAL")
+_clients_conn.execute("PRAGMA temp_store=MEMORY")
+_clients_conn.execute("PRAGMA cache_size=-20000")
+_clients_lock = threading.Lock()
+
+# SQL como constantes de módulo: com a conexão de vida longa, as
+# strings idênticas acertam o cache de statements compilados do
+# sqlite3 em vez de serem reparseadas a cada chamada
+_SQL_VALIDATE_KEY = "SELECT usage_count, usage_limit FROM clients WHERE api_key = ?"
+_SQL_INCREMENT_USAGE = "UPDATE clients SET usage_count = usage_count + 1 WHERE api_key = ?"
+_SQL_CHECK_AND_INCREMENT = (
+    "UPDATE clients SET usage_count = usage_count + 1 "
+    "WHERE api_key = ? AND usage_count < usage_limit"
+)
+_SQL_CLIENT_INFO = "SELECT name, usage_count, usage_limit FROM clients WHERE api_key = ?"
+_SQL_LISTAR_CLIENTES = "SELECT api_key, name, usage_count, usage_limit FROM clients LIMIT ? OFFSET ?"
+
+# Cache curto da validade das chaves: rajadas de requisições com uma
+# chave esgotada ou inexistente são rejeitadas sem tocar o banco, e
+# validações repetidas dispensam o SELECT. O TTL de 5s limita por
+# quanto tempo uma mudança de limite demora a ser observada
+_key_state_cache = TTLCache(maxsize=10000, ttl=5.0)
+
+def verificar_clients_db():
+    """
+    Smoke check do banco de clientes, para rodar no startup: garante a
+    tabela em arquivos recém-criados e falha cedo, com erro claro, se o
+    arquivo apontado não for utilizável — em vez de estourar na
+    primeira chamada de /categorize.
+    """
+    with _clients_lock:
+        _clients_conn.execute(
+            "CREATE TABLE IF NOT EXISTS clients ("
+            "api_key TEXT PRIMARY KEY, "
+            "name TEXT NOT NULL, "
+            "usage_count INTEGER DEFAULT 0, "
+            "usage_limit INTEGER NOT NULL)"
+        )
+        _clients_conn.execute("SELECT api_key FROM clients LIMIT 1").fetchone()
+
+def validate_api_key(api_key):
+    """
+    Verifica se a chave de API existe e ainda tem limite de uso.
+
+    Returns:
+        bool: True se a chave é válida e está dentro do limite
+    """
+    with _clients_lock:
+        estado = _key_state_cache.get(api_key)
+        if estado is not None:
+            return estado
+        cursor = _clients_conn.execute(_SQL_VALIDATE_KEY, (api_key,))
+        row = cursor.fetchone()
+        valido = row is not None and row[0] < row[1]
+        _key_state_cache[api_key] = valido
+    return valido
+
+def increment_usage(api_key):
+    """Incrementa o contador de uso da chave de API."""
+    with _clients_lock:
+        _clients_conn.execute(_SQL_INCREMENT_USAGE, (api_key,))
+
+def check_and_increment_usage(api_key):
+    """
+    Valida a chave e consome uma unidade de uso em um único UPDATE
+    condicional, eliminando a janela de corrida (e um round-trip)
+    entre o SELECT de validação e o UPDATE de incremento.
+
+    Returns:
+        bool: True se a chave é válida e havia limite disponível
+    """
+    with _clients_lock:
+        # Rejeição rápida: estado negativo recente dispensa o UPDATE
+        if _key_state_cache.get(api_key) is False:
+            return False
+        cursor = _clients_conn.execute(_SQL_CHECK_AND_INCREMENT, (api_key,))
+        permitido = cursor.rowcount == 1
+        if not permitido:
+            _key_state_cache[api_key] = False
+    return permitido
+
+def get_client_info(api_key):
+    """
+    Retorna os dados cadastrais e de uso de uma chave de API.
+
+    Returns:
+        dict: Dados do cliente, ou None se a chave não existir
+    """
+    with _clients_lock:
+        cursor = _clients_conn.execute(_SQL_CLIENT_INFO, (api_key,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {"name": row[0], "usage_count": row[1], "usage_limit": row[2]}
+
+def listar_todos_clientes(limite=100, deslocamento=0):
+    """
+    Lista os clientes cadastrados no banco de clientes, paginados
+    para não materializar a tabela inteira a cada consulta.
+    """
+    with _clients_lock:
+        cursor = _clients_conn.execute(_SQL_LISTAR_CLIENTES, (limite, deslocamento))
+        rows = cursor.fetchall()
+    return [
+        {"api_key": row[0], "name": row[1], "usage_count": row[2], "usage_limit": row[3]}
+        for row in rows
+    ]
+
 # Função para inicializar o banco de dados com dados de exemplo
 def initialize_database_with_sample_data():
     """
     Inicializa o banco de dados com dados de exemplo.
     """
-    engine, SessionLocal = get_database_connection()
+    create_tables()
     db = SessionLocal()
     
     try: